@@ -1,17 +1,21 @@
 import os
-import cv2
-from modules.config_loader import ConfigLoader
-from modules.logger_utils import LoggerManager
-from modules.image_processor import ImageProcessor
-from modules.image_preprocessor import ImagePreprocessor
-from modules.config_loader import PauseManager
-from modules.whitespace_processor import WhitespaceProcessor
-from modules.image_padder import ImagePadder
+import sys
+from modules.config_loader import ConfigLoader, PauseManager
 
 
 class ImageSquareProcessor:
-    def __init__(self, config_path='./config/config.yaml'):
-        self.config = ConfigLoader.load_config(config_path)
+    def __init__(self, config_path='./config/config.yaml', config=None):
+        # Pipeline stages (and PIL/tqdm with them) are imported here rather than
+        # at module level so CLI subcommands that never process images start fast.
+        from modules.logger_utils import LoggerManager
+        from modules.image_processor import ImageProcessor
+        from modules.image_preprocessor import ImagePreprocessor
+        from modules.whitespace_processor import WhitespaceProcessor
+        from modules.image_padder import ImagePadder
+        from modules.control_server import ControlServer
+        from modules.profiler import RunProfiler
+
+        self.config = config if config is not None else ConfigLoader.load_config(config_path)
         self.logger = LoggerManager()
 
         self.bin_folder = os.path.abspath(self.config['input_folders'][0])
@@ -24,29 +28,40 @@ class ImageSquareProcessor:
              
         self.pause_manager=PauseManager(self.config, logger=self.logger)
         self.padder = ImagePadder(self.config, logger=self.logger)
-        self.config["custom_named_colors"] = self.padder.custom_colors
         
-        self.preprocessor = ImagePreprocessor(self.config, logger=self.logger, pause_manager=self.pause_manager)
-        self.processor = ImageProcessor(self.config, logger=self.logger)
+        self.profiler = RunProfiler(self.config, logger=self.logger)
+        self.preprocessor = ImagePreprocessor(self.config, logger=self.logger, pause_manager=self.pause_manager, profiler=self.profiler)
+        self.processor = ImageProcessor(self.config, logger=self.logger, pause_manager=self.pause_manager, profiler=self.profiler)
+        self.control_server = ControlServer(self.config, self.pause_manager, logger=self.logger)
         self.whitespace_util = WhitespaceProcessor(self.config, logger=self.logger)
         
 
     def run(self):
-        # Start listening for keyboard input in CMD
-        PauseManager.start_keyboard_listener()
-        
+        # Pause/resume/drain/resize via signals, the control socket and, in CMD, the keyboard
+        self.pause_manager.install_signal_handlers()
+        if self.config.get("enable_control_server", True):
+            self.control_server.start()
+        if self.config.get("enable_pause_resume", False):
+            self.pause_manager.start_keyboard_listener()
+
         all_folders = [self.bin_folder] + self.additional_folders
+        self.profiler.start()
 
-        # Run whitespace or padding preprocessing first
-        self.preprocessor.process_folders(all_folders)
+        try:
+            # Run whitespace or padding preprocessing first
+            self.preprocessor.process_folders(all_folders)
 
-        # Resize using parallel processing
-        self.processor.process_resizing_parallel(
-            bin_folder=self.bin_folder,
-            output_folder=self.output_folder,
-            sizes=self.sizes,
-            max_workers=self.config.get("max_workers") or os.cpu_count()
-        )
+            # Resize using parallel processing
+            self.processor.process_resizing_parallel(
+                bin_folder=self.bin_folder,
+                output_folder=self.output_folder,
+                sizes=self.sizes,
+                max_workers=self.config.get("max_workers") or os.cpu_count()
+            )
+        finally:
+            self.control_server.stop()
+            self.pause_manager.restore_signal_handlers()
+            self.profiler.stop_and_report()
 
         self.logger.log("Image processing completed.")
 
@@ -65,6 +80,5 @@ class ImageSquareProcessor:
 
 
 if __name__ == '__main__':
-    processor = ImageSquareProcessor(config_path='./config/config.yaml')
-    processor.run()
-    input("Done. Press Enter to exit.")
+    from modules.cli import main
+    sys.exit(main())
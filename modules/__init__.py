@@ -1,19 +1,42 @@
 # __init__.py
 
 # __init__.py for the 'modules' package
+#
+# Classes are imported on first access so that importing one light module
+# (e.g. the config loader for a CLI estimate) does not pull in PIL, OpenCV,
+# psutil or tqdm.
 
-from .config_loader import ConfigLoader, PauseManager, TimeTracker
-from .logger_utils import LoggerManager, SummaryLogger, DailyAggregator
-from .worker_advisor import WorkerAdvisor, SystemEstimator
-from .image_processor import ImageProcessor
-from .image_preprocessor import ImagePreprocessor
-from .image_padder import ImagePadder
-from .whitespace_processor import WhitespaceProcessor
+import importlib
+
+_EXPORTS = {
+    "ConfigLoader": "config_loader", "PauseManager": "config_loader", "TimeTracker": "config_loader",
+    "ControlServer": "control_server",
+    "LoggerManager": "logger_utils", "SummaryLogger": "logger_utils", "DailyAggregator": "logger_utils",
+    "MetricsStore": "metrics_store",
+    "WorkerAdvisor": "worker_advisor", "SystemEstimator": "worker_advisor",
+    "ImageProcessor": "image_processor",
+    "ImagePreprocessor": "image_preprocessor",
+    "ImagePadder": "image_padder",
+    "WhitespaceProcessor": "whitespace_processor",
+    "RunProfiler": "profiler",
+    "RawPreviewExtractor": "raw_preview",
+    "EquivalenceHarness": "equivalence",
+    "SizePolicy": "size_policy",
+}
 
 __all__ = [
-    "ConfigLoader", "PauseManager", "TimeTracker",
-    "LoggerManager", "SummaryLogger", "DailyAggregator",
+    "ConfigLoader", "PauseManager", "TimeTracker", "ControlServer",
+    "LoggerManager", "SummaryLogger", "DailyAggregator", "MetricsStore",
     "WorkerAdvisor", "SystemEstimator",
     "ImageProcessor", "ImagePreprocessor",
-    "ImagePadder", "WhitespaceProcessor"
+    "ImagePadder", "WhitespaceProcessor", "RunProfiler", "RawPreviewExtractor",
+    "EquivalenceHarness", "SizePolicy"
 ]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
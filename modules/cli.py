@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import argparse
+from modules.config_loader import ConfigLoader
+
+# Only the standard library and the config loader are imported here; each
+# subcommand imports the stages it needs, so `plan`, `aggregate` and `control`
+# never load PIL or OpenCV.
+
+
+def _parse_value(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def load_config(args):
+    config = ConfigLoader.load_config(args.config)
+    for item in args.set:
+        if '=' not in item:
+            raise SystemExit(f"--set expects key=value, got '{item}'")
+        key, raw = item.split('=', 1)
+        config[key.strip()] = _parse_value(raw.strip())
+    if args.input:
+        config["input_folders"] = args.input
+    if args.output:
+        config["output_folder"] = args.output
+    if args.sizes:
+        config["resize_sizes"] = args.sizes
+    if args.workers:
+        config["max_workers"] = args.workers
+    if args.color:
+        config["padding_color"] = args.color
+    return config
+
+
+def cmd_run(args, config):
+    from image_square_processor import ImageSquareProcessor
+    ImageSquareProcessor(config=config).run()
+    return 0
+
+
+def cmd_plan(args, config):
+    from modules.worker_advisor import SystemEstimator
+    totals = {}
+    for folder in config["input_folders"]:
+        for key, value in SystemEstimator(os.path.abspath(folder)).estimate_processing_time().items():
+            if key in ("max_workers", "overhead_factor"):
+                totals[key] = value
+            else:
+                totals[key] = totals.get(key, 0) + value
+    if totals.get("total_images"):
+        totals["time_per_image"] = totals["sequential_time"] / totals["total_images"]
+    totals["output_files"] = totals.get("total_images", 0) * len(config.get("resize_sizes", []))
+
+    for key, value in totals.items():
+        print(f"{key:<16} {value:.2f}" if isinstance(value, float) else f"{key:<16} {value}")
+    return 0
+
+
+def cmd_bench(args, config):
+    import tempfile
+    from time import time
+    from modules.image_processor import ImageProcessor
+    from modules.logger_utils import LoggerManager
+
+    logger = LoggerManager()
+    logger.set_level("error")  # keep per-file chatter out of the timings
+    processor = ImageProcessor(config, logger=logger)
+    images = []
+    for folder in config["input_folders"]:
+        images += processor.find_images(os.path.abspath(folder))
+    images = images[:args.limit]
+    if not images:
+        print("No images found to benchmark.")
+        return 1
+
+    sizes = config.get("resize_sizes", [768, 1024, 320, 640, 1280])
+    with tempfile.TemporaryDirectory() as output_folder:
+        profiles = processor.build_profiles(output_folder, sizes, root=output_folder)
+        start = time()
+        for path in images:
+            processor.resize_image(path, output_folder, sizes, profiles=profiles)
+        elapsed = time() - start
+
+    print(f"Images:            {len(images)} x {sum(len(p['sizes']) for p in profiles)} outputs")
+    print(f"Total time:        {elapsed:.2f} seconds")
+    print(f"Average per image: {elapsed / len(images):.3f} seconds")
+    print(f"Throughput:        {len(images) / elapsed:.2f} images/second")
+    for stage, (count, seconds) in sorted(processor.time_tracker.stage_summary().items()):
+        print(f"  {stage:<10} {seconds:8.2f} s over {count} calls")
+    return 0
+
+
+def cmd_aggregate(args, config):
+    from modules.metrics_store import MetricsStore
+    store = MetricsStore(config.get("metrics_db", "./logs/metrics.sqlite3"))
+    print(store.format_trend(store.trend("weekly" if args.weekly else "daily", args.limit)))
+    if args.prom:
+        print(f"Prometheus metrics written to {store.export_prometheus(args.prom)}")
+    return 0
+
+
+def cmd_compare(args, config):
+    from modules.equivalence import EquivalenceHarness
+    from modules.logger_utils import LoggerManager
+
+    overrides = {}
+    for item in args.candidate:
+        if '=' not in item:
+            raise SystemExit(f"--candidate expects key=value, got '{item}'")
+        key, raw = item.split('=', 1)
+        overrides[key.strip()] = _parse_value(raw.strip())
+
+    logger = LoggerManager()
+    logger.set_level("error")
+    harness = EquivalenceHarness(config, overrides, logger=logger, min_psnr=args.min_psnr,
+                                 min_ssim=args.min_ssim, placement_tolerance=args.placement_tolerance,
+                                 repeats=args.repeats)
+    rows, summary = harness.run(corpus_folder=args.corpus, seed=args.seed)
+    harness.write_report(rows, summary)
+    missing = sum(1 for row in rows if row["status"] == "missing")
+    if summary["failed"] or not summary["compared"]:
+        return 1
+    return 1 if missing and not args.allow_missing else 0
+
+
+def cmd_control(args, config):
+    from modules.control_server import send_command
+    try:
+        print(send_command(" ".join(args.control_command), config))
+    except OSError as e:
+        print(f"No running batch is accepting commands: {e}")
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="image_square_processor", description="Batch square image resizer.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-c", "--config", default="./config/config.yaml", help="YAML or JSON config file")
+    common.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a config value (JSON values allowed), repeatable")
+    common.add_argument("--input", action="append", metavar="FOLDER", help="Input folder, repeatable")
+    common.add_argument("--output", metavar="FOLDER", help="Output folder")
+    common.add_argument("--sizes", type=int, nargs="+", metavar="PX", help="Output sizes")
+    common.add_argument("--workers", type=int, help="Number of worker threads")
+    common.add_argument("--color", help="Padding color")
+
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("run", parents=[common], help="Process all input folders").set_defaults(func=cmd_run)
+    sub.add_parser("plan", parents=[common], help="Estimate the work and time for a run").set_defaults(func=cmd_plan)
+
+    bench = sub.add_parser("bench", parents=[common], help="Time resizing a sample of images into a temp folder")
+    bench.add_argument("--limit", type=int, default=20, help="Number of images to time")
+    bench.set_defaults(func=cmd_bench)
+
+    aggregate = sub.add_parser("aggregate", parents=[common], help="Show throughput trends from the metrics store")
+    aggregate.add_argument("--weekly", action="store_true", help="Group by ISO week instead of day")
+    aggregate.add_argument("--limit", type=int, default=14, help="Number of periods to show")
+    aggregate.add_argument("--prom", metavar="PATH", help="Also write Prometheus textfile metrics")
+    aggregate.set_defaults(func=cmd_aggregate)
+
+    compare = sub.add_parser("compare", parents=[common],
+                             help="Compare outputs of the current config against candidate overrides")
+    compare.add_argument("--candidate", action="append", default=[], metavar="KEY=VALUE",
+                         help="Config override that defines the candidate, repeatable")
+    compare.add_argument("--corpus", metavar="FOLDER", help="Use these images instead of the synthetic corpus")
+    compare.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic corpus")
+    compare.add_argument("--min-psnr", type=float, default=40.0, help="Minimum PSNR in dB")
+    compare.add_argument("--min-ssim", type=float, default=0.98, help="Minimum SSIM")
+    compare.add_argument("--placement-tolerance", type=int, default=1, help="Allowed padding shift in pixels")
+    compare.add_argument("--repeats", type=int, default=3,
+                         help="Timed runs per side after a warm-up; the median is reported")
+    compare.add_argument("--allow-missing", action="store_true",
+                         help="Do not fail when the candidate intentionally skips outputs")
+    compare.set_defaults(func=cmd_compare)
+
+    control = sub.add_parser("control", parents=[common], help="Send a command to a running batch")
+    control.add_argument("control_command", nargs="+", metavar="command", help="pause | resume | drain | workers N | log-level LEVEL | status")
+    control.set_defaults(func=cmd_control)
+    return parser
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Bare invocation (or options only) keeps the old behaviour of a full run
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ["run"] + argv
+    args = build_parser().parse_args(argv)
+    return args.func(args, load_config(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,88 +1,211 @@
 import os
-import time
 import json
-import yaml
+import signal
+import hashlib
 import threading
 
 
 class ConfigLoader:
     """
     Handles loading of configuration files (YAML or JSON).
+
+    Parsed results are kept as JSON under cache_dir, keyed by path, size and
+    mtime, so repeated short runs skip importing yaml and re-parsing files.
     """
-    @staticmethod
-    def load_config(config_path='./config/config.yaml'):
+    cache_dir = './logs/.cache'
+    _memory_cache = {}
+
+    @classmethod
+    def load_config(cls, config_path='./config/config.yaml'):
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"Config file not found: {config_path}")
+        return cls.load_cached(config_path, cls._parse_config)
 
+    @staticmethod
+    def _parse_config(config_path):
         ext = os.path.splitext(config_path)[-1].lower()
         with open(config_path, 'r') as f:
             if ext == '.yaml' or ext == '.yml':
+                import yaml
                 return yaml.safe_load(f)
             elif ext == '.json':
                 return json.load(f)
             else:
                 raise ValueError("Unsupported config file format. Use .yaml, .yml, or .json")
 
+    @classmethod
+    def load_cached(cls, path, parse):
+        """Return parse(path), reusing a cached copy while the file is unchanged."""
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{parse.__qualname__}"
+        if key in cls._memory_cache:
+            return json.loads(cls._memory_cache[key])
+
+        cache_path = os.path.join(cls.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.json')
+        try:
+            with open(cache_path, 'r') as f:
+                text = f.read()
+        except OSError:
+            data = parse(path)
+            try:
+                text = json.dumps(data)
+            except TypeError:
+                return data  # not JSON-serialisable; don't cache
+            try:
+                os.makedirs(cls.cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(text)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass  # read-only location; still return the parsed result
+
+        cls._memory_cache[key] = text
+        return json.loads(text)
 
-class PauseManager:
-    """
-    Handles pausing/resuming via a 'pause.flag' file.
-    """
-import os
-import time
-import threading
-import msvcrt
 
 class PauseManager:
     """
-    Handles pausing/resuming via a 'pause.flag' file.
+    Event-driven run control shared by the dispatcher and the workers.
+
+    Pausing, resuming, draining, worker-count and log-level changes are pushed
+    in by the ControlServer, signal handlers or the keyboard listener; the hot
+    path only checks in-memory events, so no syscall is made per image.
     """
     def __init__(self, config, logger=None):
         self.config = config
         self.logger = logger
-        self._pause_event = threading.Event()  
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._drain_event = threading.Event()
+        self._lock = threading.Lock()
+        self.worker_limit = config.get("max_workers") or os.cpu_count()
+        # Thread pools are sized to this, so live changes can never exceed it
+        self.max_worker_limit = max(self.worker_limit, config.get("max_worker_limit") or 2 * (os.cpu_count() or 1))
+        self._limit_overridden = False
+        self._previous_handlers = {}
+
+    @property
+    def paused(self):
+        return not self._resume_event.is_set()
+
+    @property
+    def draining(self):
+        return self._drain_event.is_set()
+
+    def pause(self):
+        self._resume_event.clear()
+        self._log("[Paused] in-flight images will finish, no new ones will start.")
+
+    def resume(self):
+        self._resume_event.set()
+        self._log("[Resumed]")
+
+    def toggle_pause(self):
+        if self.paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def drain(self):
+        """Finish in-flight images, then stop picking up new ones."""
+        self._drain_event.set()
+        # A paused run must wake up so the dispatcher can notice the drain.
+        self._resume_event.set()
+        self._log("[Draining] finishing in-flight images before stopping.")
+
+    def set_worker_limit(self, workers):
+        workers = int(workers)
+        if workers < 1:
+            raise ValueError(f"Worker count must be at least 1, got {workers}")
+        if workers > self.max_worker_limit:
+            raise ValueError(f"Worker count must be at most {self.max_worker_limit} (max_worker_limit), got {workers}")
+        with self._lock:
+            self.worker_limit = workers
+            self._limit_overridden = True
+        self._log(f"Worker limit set to {workers}")
+
+    def set_log_level(self, level):
+        if self.logger is None:
+            raise ValueError("No logger attached to change the level of")
+        self.logger.set_level(level)
+        self._log(f"Log level set to {level.upper()}")
+
+    def start_stage(self, workers):
+        """
+        Set the worker limit for a new stage unless it was already changed
+        live, and return the pool size the stage should use.
+        """
+        with self._lock:
+            self.max_worker_limit = max(self.max_worker_limit, workers)
+            if not self._limit_overridden:
+                self.worker_limit = workers
+            return self.max_worker_limit
+
+    def pause_if_needed(self):
+        """Block while paused. Returns False once a drain has been requested."""
+        self._resume_event.wait()
+        return not self._drain_event.is_set()
+
+    def install_signal_handlers(self):
+        """
+        SIGUSR1 toggles pause, SIGUSR2 drains, and the first SIGINT/SIGTERM
+        drains instead of killing in-flight work. A second one raises
+        KeyboardInterrupt; the pool still lets in-flight images finish.
+        Only possible from the main thread; unavailable signals are skipped.
+        The previous handlers are kept for restore_signal_handlers().
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def _on_stop(signum, frame):
+            if self.draining:
+                raise KeyboardInterrupt
+            self.drain()
+
+        handlers = {
+            "SIGUSR1": lambda signum, frame: self.toggle_pause(),
+            "SIGUSR2": lambda signum, frame: self.drain(),
+            "SIGINT": _on_stop,
+            "SIGTERM": _on_stop,
+        }
+        for name, handler in handlers.items():
+            if hasattr(signal, name):
+                signum = getattr(signal, name)
+                self._previous_handlers.setdefault(signum, signal.signal(signum, handler))
+
+    def restore_signal_handlers(self):
+        """Put back whatever handlers were installed before install_signal_handlers()."""
+        while self._previous_handlers:
+            signum, handler = self._previous_handlers.popitem()
+            signal.signal(signum, handler if handler is not None else signal.SIG_DFL)
+
+    def start_keyboard_listener(self):
+        """P/R/D keys in a Windows console; a no-op where msvcrt is unavailable."""
+        try:
+            import msvcrt
+        except ImportError:
+            return
 
-    @classmethod
-    def start_keyboard_listener(cls):
         def keyboard_loop():
-            print("[P]ause / [R]esume")
-            while True:
-                if msvcrt.kbhit():
-                    key = msvcrt.getch().lower()
-                    if key == b'p':
-                        with open("pause.flag", "w") as f:
-                            f.write("paused")
-                        print("[Paused]")
-                    elif key == b'r':
-                        if os.path.exists("pause.flag"):
-                            os.remove("pause.flag")
-                        print("[Resumed]")
+            print("[P]ause / [R]esume / [D]rain")
+            while not self.draining:
+                key = msvcrt.getch().lower()
+                if key == b'p':
+                    self.pause()
+                elif key == b'r':
+                    self.resume()
+                elif key == b'd':
+                    self.drain()
 
         t = threading.Thread(target=keyboard_loop, daemon=True)
         t.start()
 
-    def pause_if_needed(self):
-        if self.config.get("enable_pause_resume", True):
-            while os.path.exists('pause.flag'):
-                self._pause_event.set()
-                print("Paused... waiting to resume.")
-                time.sleep(1)
-            self._pause_event.clear()
-
-    @staticmethod
-    def create_pause_flag():
-        with open('pause.flag', 'w') as f:
-            f.write('Paused')
-        print("Pause flag created.")
-
-    @staticmethod
-    def remove_pause_flag():
-        if os.path.exists('pause.flag'):
-            os.remove('pause.flag')
-            print("Pause flag removed.")
+    def _log(self, message):
+        if self.logger:
+            self.logger.log(message)
         else:
-            print("No pause flag to remove.")
-
+            print(message)
 
 
 class TimeTracker:
@@ -92,6 +215,8 @@ class TimeTracker:
     def __init__(self):
         self.total_time = 0.0
         self.total_images = 0
+        self.stage_times = {}
+        self.size_times = {}
         self._lock = threading.Lock()
 
     def update_time(self, seconds: float):
@@ -102,6 +227,24 @@ class TimeTracker:
         with self._lock:
             self.total_images += 1
 
+    def add_stage_time(self, stage, seconds, calls=1):
+        with self._lock:
+            count, total = self.stage_times.get(stage, (0, 0.0))
+            self.stage_times[stage] = (count + calls, total + seconds)
+
+    def stage_summary(self):
+        with self._lock:
+            return dict(self.stage_times)
+
+    def add_size_time(self, size, seconds):
+        """Resample + encode time spent on one output size."""
+        with self._lock:
+            self.size_times[size] = self.size_times.get(size, 0.0) + seconds
+
+    def size_summary(self):
+        with self._lock:
+            return dict(self.size_times)
+
     def average_time(self):
         if self.total_images == 0:
             return 0.0
@@ -0,0 +1,151 @@
+import os
+import sys
+import socket
+import threading
+
+
+class ControlServer:
+    """
+    Local command endpoint for a running batch.
+
+    Listens on a Unix socket (or 127.0.0.1 when AF_UNIX is unavailable) and
+    forwards one-line commands to the PauseManager:
+
+        pause | resume | drain | workers <n> | log-level <level> | status
+    """
+    def __init__(self, config, pause_manager, logger=None):
+        self.config = config
+        self.pause_manager = pause_manager
+        self.logger = logger
+        self.socket_path = os.path.abspath(config.get("control_socket", "./logs/control.sock"))
+        self.port = config.get("control_port", 47653)
+        self._sock = None
+        self._inode = None
+
+    def start(self):
+        """
+        Bind the endpoint. If another live run already owns the configured
+        socket, a PID-suffixed socket is used instead; if binding still fails
+        the run continues without a control endpoint.
+        """
+        try:
+            if hasattr(socket, "AF_UNIX"):
+                address = self._bind_unix()
+            else:
+                address = self._bind_tcp()
+        except OSError as e:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+            self._log(f"Control endpoint unavailable, continuing without it: {e}", level="error")
+            return
+        self._sock.listen()
+
+        t = threading.Thread(target=self._serve, daemon=True)
+        t.start()
+        self._log(f"Control endpoint listening on {address}")
+
+    def _bind_unix(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if self._is_live(self.socket_path):
+            base, ext = os.path.splitext(self.socket_path)
+            self.socket_path = f"{base}-{os.getpid()}{ext}"
+            self._log(f"{base}{ext} belongs to another running batch; using {self.socket_path}")
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # stale socket from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        self._inode = os.stat(self.socket_path).st_ino
+        return self.socket_path
+
+    def _bind_tcp(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", self.port))
+        return f"127.0.0.1:{self.port}"
+
+    @staticmethod
+    def _is_live(path):
+        if not os.path.exists(path):
+            return False
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                return False
+        return True
+
+    def stop(self):
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        # Only remove the socket file we created, never one another run re-bound
+        try:
+            if self._inode is not None and os.stat(self.socket_path).st_ino == self._inode:
+                os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    def _serve(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # socket closed by stop()
+            with conn:
+                try:
+                    line = conn.makefile("r").readline()
+                    if line:  # liveness probes connect and hang up without a command
+                        conn.sendall((self.handle_command(line) + "\n").encode())
+                except OSError:
+                    pass  # client went away; keep serving
+
+    def handle_command(self, line):
+        parts = line.strip().split()
+        if not parts:
+            return "error: empty command"
+        command, args = parts[0].lower(), parts[1:]
+        pm = self.pause_manager
+        try:
+            if command == "pause":
+                pm.pause()
+            elif command == "resume":
+                pm.resume()
+            elif command == "drain":
+                pm.drain()
+            elif command == "workers" and len(args) == 1:
+                pm.set_worker_limit(args[0])
+            elif command == "log-level" and len(args) == 1:
+                pm.set_log_level(args[0])
+            elif command != "status":
+                return f"error: unknown command '{line.strip()}'"
+        except ValueError as e:
+            return f"error: {e}"
+        return f"ok paused={pm.paused} draining={pm.draining} workers={pm.worker_limit}"
+
+    def _log(self, message, level="info"):
+        if self.logger:
+            self.logger.log(message, level=level)
+        else:
+            print(message)
+
+
+def send_command(command, config):
+    """Send one command to a running batch and return its reply."""
+    socket_path = os.path.abspath(config.get("control_socket", "./logs/control.sock"))
+    if hasattr(socket, "AF_UNIX"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = socket_path
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ("127.0.0.1", config.get("control_port", 47653))
+    with sock:
+        sock.connect(address)
+        sock.sendall((command.strip() + "\n").encode())
+        return sock.makefile("r").readline().strip()
+
+
+if __name__ == '__main__':
+    # e.g. python -m modules.control_server workers 4
+    from modules.config_loader import ConfigLoader
+    print(send_command(" ".join(sys.argv[1:]) or "status", ConfigLoader.load_config('./config/config.yaml')))
@@ -0,0 +1,305 @@
+import os
+import tempfile
+from time import time
+from statistics import median
+from datetime import datetime
+import numpy as np
+from PIL import Image
+from modules.config_loader import TimeTracker
+from modules.logger_utils import LoggerManager
+from modules.image_processor import ImageProcessor
+
+
+class EquivalenceHarness:
+    """
+    Reference-vs-candidate comparison for changes that may alter pixels.
+
+    The same corpus is run through ImageProcessor twice, once with the base
+    config and once with candidate overrides (e.g. a new engine mode or size
+    policy). Every reference output is compared with its candidate twin for
+    exact dimensions, padding placement, PSNR and SSIM. Runtimes are the
+    median of `repeats` timed passes after an untimed warm-up, alternating
+    which side goes first, in total and per output size. A deterministic synthetic corpus covers odd aspect ratios,
+    RGBA/P/L modes, 16-bit TIFF and tiny images.
+    """
+    # name, mode, (width, height), extension
+    CORPUS = [
+        ("wide_rgb", "RGB", (1037, 211), ".png"),
+        ("tall_rgb", "RGB", (173, 1201), ".png"),
+        ("square_rgb", "RGB", (800, 800), ".png"),
+        ("sliver_rgb", "RGB", (1500, 3), ".png"),
+        ("photo_jpg", "RGB", (1600, 1067), ".jpg"),
+        ("alpha_rgba", "RGBA", (640, 427), ".png"),
+        ("palette_p", "P", (333, 500), ".png"),
+        ("gray_l", "L", (501, 377), ".png"),
+        ("gray16_tiff", "I;16", (401, 603), ".tiff"),
+        ("tiny_rgb", "RGB", (7, 5), ".png"),
+        ("one_pixel", "RGB", (1, 1), ".png"),
+    ]
+
+    def __init__(self, config, candidate_overrides, logger=None, min_psnr=40.0, min_ssim=0.98, placement_tolerance=1,
+                 repeats=3):
+        self.config = config
+        self.candidate_config = dict(config, **candidate_overrides)
+        self.candidate_overrides = candidate_overrides
+        self.logger = logger or LoggerManager()
+        self.min_psnr = min_psnr
+        self.min_ssim = min_ssim
+        self.placement_tolerance = placement_tolerance
+        self.repeats = max(1, int(repeats))
+        self.sizes = config.get("resize_sizes", [768, 1024, 320, 640, 1280])
+
+    @classmethod
+    def build_corpus(cls, folder, seed=1234):
+        """Write the synthetic corpus to folder; same seed, same bytes."""
+        os.makedirs(folder, exist_ok=True)
+        rng = np.random.default_rng(seed)
+        paths = []
+        for name, mode, (width, height), ext in cls.CORPUS:
+            y, x = np.mgrid[0:height, 0:width]
+            x = x / max(width - 1, 1)
+            y = y / max(height - 1, 1)
+            rgb = np.stack([
+                x,
+                y,
+                0.5 + 0.5 * np.sin(12 * np.pi * x * y),
+            ], axis=-1)
+            rgb = np.clip(rgb + rng.normal(0, 0.05, rgb.shape), 0, 1)
+            # Hard edges on a white field make resampling and cropping differences visible
+            rgb[(np.abs(x - 0.5) < 0.2) & (np.abs(y - 0.5) < 0.2)] = (0.1, 0.2, 0.6)
+            rgb[(x < 0.08) | (x > 0.92)] = 1.0
+
+            rgb8 = (rgb * 255).round().astype(np.uint8)
+            if mode == "RGB":
+                img = Image.fromarray(rgb8, "RGB")
+            elif mode == "RGBA":
+                alpha = (255 * np.clip(1.5 - 2 * np.hypot(x - 0.5, y - 0.5), 0, 1)).astype(np.uint8)
+                img = Image.fromarray(np.dstack([rgb8, alpha]), "RGBA")
+            elif mode == "P":
+                img = Image.fromarray(rgb8, "RGB").quantize(64)
+            elif mode == "L":
+                img = Image.fromarray(rgb8.mean(axis=-1).astype(np.uint8), "L")
+            else:
+                img = Image.fromarray((rgb.mean(axis=-1) * 65535).round().astype(np.uint16))
+
+            path = os.path.join(folder, name + ext)
+            img.save(path)
+            paths.append(path)
+        return paths
+
+    def run(self, corpus_folder=None, seed=1234):
+        """Run both configurations and return (rows, summary)."""
+        with tempfile.TemporaryDirectory() as workdir:
+            if corpus_folder is None:
+                corpus_folder = os.path.join(workdir, "corpus")
+                self.build_corpus(corpus_folder, seed)
+            sides = {
+                "reference": {"config": self.config, "out": os.path.join(workdir, "reference"),
+                              "times": [], "size_times": {}, "errors": {}},
+                "candidate": {"config": self.candidate_config, "out": os.path.join(workdir, "candidate"),
+                              "times": [], "size_times": {}, "errors": {}},
+            }
+            # Pass 0 warms the OS file cache and imports and is not timed;
+            # the order alternates so neither side always runs first
+            for rep in range(self.repeats + 1):
+                order = ("reference", "candidate") if rep % 2 == 0 else ("candidate", "reference")
+                for name in order:
+                    side = sides[name]
+                    seconds, errors, size_times = self._run_pipeline(side["config"], corpus_folder, side["out"])
+                    side["errors"].update(errors)
+                    if rep:
+                        side["times"].append(seconds)
+                        for size, size_seconds in size_times.items():
+                            side["size_times"].setdefault(size, []).append(size_seconds)
+            ref, cand = sides["reference"], sides["candidate"]
+            rows = self._compare_trees(ref["out"], cand["out"], ref["errors"], cand["errors"])
+
+        ref_time, cand_time = median(ref["times"]), median(cand["times"])
+        summary = {
+            "repeats": self.repeats,
+            "reference_seconds": ref_time,
+            "candidate_seconds": cand_time,
+            "speedup": ref_time / cand_time if cand_time else float("inf"),
+            "size_seconds": {
+                size: (median(ref["size_times"].get(size, [0.0])), median(cand["size_times"].get(size, [0.0])))
+                for size in sorted(set(ref["size_times"]) | set(cand["size_times"]))
+            },
+            "compared": sum(1 for r in rows if r["status"] in ("pass", "fail")),
+            "reference_errors": len(ref["errors"]),
+            # A reference that cannot run proves nothing about the candidate
+            "failed": sum(1 for r in rows if r["status"] in ("fail", "error")),
+        }
+        return rows, summary
+
+    def _run_pipeline(self, config, corpus_folder, output_folder):
+        processor = ImageProcessor(config, time_tracker=TimeTracker(), logger=self.logger)
+        # Every profile goes under this run's temp folder, whatever its output_folder
+        profiles = processor.build_profiles(output_folder, self.sizes, root=output_folder)
+        errors = {}
+        start = time()
+        for path in sorted(processor.find_images(corpus_folder)):
+            try:
+                processor.resize_image(path, output_folder, self.sizes, profiles=profiles)
+            except Exception as e:
+                errors[os.path.splitext(os.path.basename(path))[0]] = f"{type(e).__name__}: {e}"
+        return time() - start, errors, processor.time_tracker.size_summary()
+
+    def _compare_trees(self, ref_out, cand_out, ref_errors, cand_errors):
+        rows = []
+        for base, error in sorted(ref_errors.items()):
+            rows.append({"output": base, "status": "error", "detail": f"reference failed: {error}"})
+        for base, error in sorted(cand_errors.items()):
+            if base not in ref_errors:
+                rows.append({"output": base, "status": "error", "detail": f"candidate failed: {error}"})
+
+        for root, _, files in os.walk(ref_out):
+            for file in sorted(files):
+                ref_path = os.path.join(root, file)
+                rel = os.path.relpath(ref_path, ref_out)
+                cand_path = os.path.join(cand_out, rel)
+                if not os.path.exists(cand_path):
+                    rows.append({"output": rel, "status": "missing", "detail": "no candidate output"})
+                    continue
+                rows.append(self.compare_image(ref_path, cand_path, rel))
+        return rows
+
+    def compare_image(self, ref_path, cand_path, label=None):
+        row = {"output": label or os.path.basename(ref_path), "status": "pass", "detail": ""}
+        with Image.open(ref_path) as ref, Image.open(cand_path) as cand:
+            ref.load()
+            cand.load()
+            problems = []
+            folder = os.path.basename(os.path.dirname(cand_path))
+            if folder.startswith("img_") and folder[4:].isdigit():
+                expected = (int(folder[4:]),) * 2
+                if cand.size != expected:
+                    row.update(status="fail", detail=f"size {cand.size} != expected {expected}")
+                    return row
+            if ref.size != cand.size:
+                row.update(status="fail", detail=f"size {cand.size} != reference {ref.size}")
+                return row
+
+            ref_arr, peak = self._to_array(ref)
+            cand_arr, cand_peak = self._to_array(cand)
+            if ref_arr.shape != cand_arr.shape or peak != cand_peak:
+                row.update(status="fail", detail=f"mode {cand.mode} != reference {ref.mode}")
+                return row
+
+        row["psnr"] = self.psnr(ref_arr, cand_arr, peak)
+        row["ssim"] = self.ssim(ref_arr, cand_arr, peak)
+        ref_box, cand_box = self._content_box(ref_arr), self._content_box(cand_arr)
+        row["placement"] = (ref_box, cand_box)
+        if ref_box and cand_box and max(abs(a - b) for a, b in zip(ref_box, cand_box)) > self.placement_tolerance:
+            problems.append(f"content box {cand_box} != reference {ref_box}")
+        elif (ref_box is None) != (cand_box is None):
+            problems.append("padding covers the whole image in only one output")
+        if row["psnr"] < self.min_psnr:
+            problems.append(f"PSNR {row['psnr']:.2f} < {self.min_psnr}")
+        if row["ssim"] < self.min_ssim:
+            problems.append(f"SSIM {row['ssim']:.4f} < {self.min_ssim}")
+        if problems:
+            row.update(status="fail", detail="; ".join(problems))
+        return row
+
+    @staticmethod
+    def _to_array(img):
+        if img.mode in ("I;16", "I;16B", "I;16L", "I", "F"):
+            return np.asarray(img, dtype=np.float64), 65535.0
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            return np.asarray(img.convert("RGBA"), dtype=np.float64), 255.0
+        return np.asarray(img.convert("RGB"), dtype=np.float64), 255.0
+
+    @staticmethod
+    def _content_box(arr):
+        """
+        (left, top, right, bottom) of the area inside the padding. Padding is
+        a uniform first row or column matching the corner pixel; without it
+        the whole image is content.
+        """
+        corner = arr[0, 0]
+        differs = np.abs(arr - corner) > 0
+        if differs.ndim == 3:
+            differs = differs.any(axis=-1)
+        if differs[0, :].any() and differs[:, 0].any():
+            return (0, 0, arr.shape[1], arr.shape[0])
+        rows = np.flatnonzero(differs.any(axis=1))
+        cols = np.flatnonzero(differs.any(axis=0))
+        if not len(rows):
+            return None
+        return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+    @staticmethod
+    def psnr(a, b, peak):
+        mse = np.mean((a - b) ** 2)
+        return float("inf") if mse == 0 else float(10 * np.log10(peak ** 2 / mse))
+
+    @staticmethod
+    def ssim(a, b, peak, window=7):
+        """Mean SSIM over box windows, averaged across channels."""
+        if a.ndim == 2:
+            a, b = a[..., None], b[..., None]
+        k = max(1, min(window, a.shape[0], a.shape[1]))
+        c1, c2 = (0.01 * peak) ** 2, (0.03 * peak) ** 2
+
+        def box_mean(x):
+            c = np.pad(x, ((1, 0), (1, 0), (0, 0))).cumsum(0).cumsum(1)
+            return (c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / (k * k)
+
+        mu_a, mu_b = box_mean(a), box_mean(b)
+        var_a = box_mean(a * a) - mu_a ** 2
+        var_b = box_mean(b * b) - mu_b ** 2
+        cov = box_mean(a * b) - mu_a * mu_b
+        ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+        return float(ssim_map.mean())
+
+    def write_report(self, rows, summary, report_dir='./logs'):
+        lines = [
+            f"Candidate overrides: {self.candidate_overrides}",
+            f"Tolerances: PSNR >= {self.min_psnr} dB, SSIM >= {self.min_ssim}, "
+            f"placement +/- {self.placement_tolerance}px",
+            f"Reference time: {summary['reference_seconds']:.2f} s, candidate time: "
+            f"{summary['candidate_seconds']:.2f} s, speedup: {summary['speedup']:.2f}x "
+            f"(median of {summary['repeats']} runs after a warm-up)",
+            "",
+            f"{'status':<8} {'psnr':>8} {'ssim':>7}  output",
+        ]
+        by_size = {}
+        for row in rows:
+            psnr = f"{row['psnr']:8.2f}" if "psnr" in row else f"{'-':>8}"
+            ssim = f"{row['ssim']:7.4f}" if "ssim" in row else f"{'-':>7}"
+            lines.append(f"{row['status']:<8} {psnr} {ssim}  {row['output']}  {row['detail']}".rstrip())
+            folder = row["output"].split(os.sep)[-2] if os.sep in row["output"] else ""
+            if not (folder.startswith("img_") and folder[4:].isdigit()):
+                continue
+            # Dimension and mode failures have no PSNR but still count for their size
+            stats = by_size.setdefault(int(folder[4:]), {"psnr": [], "ssim": [], "failed": 0, "missing": 0})
+            if "psnr" in row:
+                stats["psnr"].append(row["psnr"])
+                stats["ssim"].append(row["ssim"])
+            stats["failed"] += row["status"] == "fail"
+            stats["missing"] += row["status"] == "missing"
+
+        lines += ["", f"Per size:  {'min PSNR':>8} {'min SSIM':>8} {'failed':>6} {'missing':>7} "
+                      f"{'ref s':>8} {'cand s':>8}"]
+        size_seconds = summary.get("size_seconds", {})
+        for size in sorted(set(by_size) | set(size_seconds)):
+            stats = by_size.get(size, {"psnr": [], "ssim": [], "failed": 0, "missing": 0})
+            psnr = f"{min(stats['psnr']):8.2f}" if stats["psnr"] else f"{'-':>8}"
+            ssim = f"{min(stats['ssim']):8.4f}" if stats["ssim"] else f"{'-':>8}"
+            ref_s, cand_s = size_seconds.get(size, (0.0, 0.0))
+            lines.append(f"  {'img_' + str(size):<8} {psnr} {ssim} {stats['failed']:>6} {stats['missing']:>7} "
+                         f"{ref_s:>8.3f} {cand_s:>8.3f}")
+        lines.append("")
+        lines.append(f"{summary['compared']} outputs compared, {summary['failed']} failed "
+                     f"({summary['reference_errors']} reference errors), "
+                     f"{sum(1 for r in rows if r['status'] == 'missing')} missing")
+        if not summary["compared"]:
+            lines.append("Nothing was compared; check the corpus and output profiles.")
+
+        os.makedirs(report_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(report_dir, f"equivalence_{timestamp}.txt")
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        print("\n".join(lines))
+        return path
@@ -1,5 +1,6 @@
 import os
 from PIL import Image, ImageOps
+from modules.config_loader import ConfigLoader
 from modules.logger_utils import LoggerManager
 
 
@@ -11,7 +12,7 @@ class ImagePadder:
         self.padding_method = self.config.get("padding_method", "color")    
         
         self.color_file_path = self.config.get("named_color_file", "./colors.txt")
-        self.custom_colors = self._load_named_colors(self.color_file_path)
+        self.custom_colors = self.named_colors(self.config)
         
         self.padding_color = self.parse_color_string(
             self.config.get("padding_color", "white"), 
@@ -19,18 +20,32 @@ class ImagePadder:
         )
 
            
-    def _load_named_colors(self, filepath):
-        ''' Loads custom colors from a .txt file '''
+    @staticmethod
+    def named_colors(config):
+        ''' Colors from named_color_file plus any custom_named_colors set in the config '''
+        colors = ImagePadder._load_named_colors(config.get("named_color_file", "./colors.txt"))
+        colors.update({k.lower(): tuple(v) for k, v in (config.get("custom_named_colors") or {}).items()})
+        return colors
+
+    @staticmethod
+    def _load_named_colors(filepath):
+        ''' Loads custom colors from a .txt file, cached until the file changes '''
+        if not os.path.exists(filepath):
+            return {}
+        colors = ConfigLoader.load_cached(filepath, ImagePadder._parse_named_colors)
+        return {name: tuple(rgb) for name, rgb in colors.items()}
+
+    @staticmethod
+    def _parse_named_colors(filepath):
         colors = {}
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                for line in f:
-                    if ':' in line:
-                        name, rgb = line.strip().split(':', 1)
-                        try:
-                            colors[name.strip().lower()] = tuple(map(int, rgb.strip().split(',')))
-                        except ValueError:
-                            print(f"Invalid color format in {filepath}: {line}")
+        with open(filepath, 'r') as f:
+            for line in f:
+                if ':' in line:
+                    name, rgb = line.strip().split(':', 1)
+                    try:
+                        colors[name.strip().lower()] = tuple(map(int, rgb.strip().split(',')))
+                    except ValueError:
+                        print(f"Invalid color format in {filepath}: {line}")
         return colors
 
 
@@ -63,6 +78,24 @@ class ImagePadder:
         except Exception as e:
             raise ValueError(f"Invalid color format '{color_string}': {e}")
 
+    @staticmethod
+    def color_for_mode(color, mode):
+        """
+        Fit a parsed RGB(A) padding colour to a PIL image mode: single-band
+        images (L, 1, I, I;16, F) get its luminance, scaled to 16 bits for
+        the integer modes, and LA gets (luminance, alpha).
+        """
+        if not isinstance(color, tuple) or len(color) < 3:
+            return color
+        luminance = (color[0] * 299 + color[1] * 587 + color[2] * 114) // 1000
+        if mode in ("I", "F") or mode.startswith("I;16"):
+            return luminance * 257
+        if mode in ("L", "1"):
+            return luminance
+        if mode in ("LA", "La"):
+            return (luminance, color[3] if len(color) > 3 else 255)
+        return color
+
 
 
 
@@ -1,13 +1,14 @@
 import os
-import cv2
 from modules.config_loader import PauseManager
 from modules.logger_utils import LoggerManager
 from modules.image_processor import ImageProcessor
 from modules.whitespace_processor import WhitespaceProcessor
+from modules.profiler import RunProfiler
+from modules.raw_preview import RawPreviewExtractor
 
 
 class ImagePreprocessor:
-    def __init__(self, config, processor=None, logger=None, pause_manager=None):
+    def __init__(self, config, processor=None, logger=None, pause_manager=None, profiler=None):
         self.config = config
         self.output_folder = self.config.get("output_folder", "./data/processed")
         self.gray_threshold = self.config.get("gray_threshold", 200)
@@ -16,33 +17,42 @@ class ImagePreprocessor:
         self.whitespace_sizes=self.config.get("whitespace_sizes", [512])
         self.skip_processed = self.config.get("skip_processed_images", True)
         self.logger = logger or LoggerManager()
-        self.processor = processor or ImageProcessor(config, logger=self.logger)
+        self.pause_manager = pause_manager or PauseManager(config, logger=self.logger)
+        self.profiler = profiler or RunProfiler(config, logger=self.logger)
+        self.processor = processor or ImageProcessor(config, logger=self.logger, pause_manager=self.pause_manager, profiler=self.profiler)
         self.whitespace_util = WhitespaceProcessor(config, logger=self.logger)
-        self.pause_manager = pause_manager
        
 
     def process_folders(self, folders):
         option = self.config.get("whitespace_option", "remove").lower()
         for folder in folders:
             for image_path in self.processor.find_images(folder):
-                self.pause_manager.pause_if_needed()
+                if not self.pause_manager.pause_if_needed():
+                    return  # drain requested
                 if option == "remove":
-                    self._remove_whitespace(image_path)
+                    self.profiler.run(self._remove_whitespace, image_path)
                     
                 elif option == "add":
-                    self._add_padding(image_path)
+                    self.profiler.run(self._add_padding, image_path)
     
     def _remove_whitespace(self, image_path):
         if not self.whitespace_util.safety_process():
             return  # Skip processing if removal is disabled
-        output_filename = os.path.basename(image_path)
+        file_base = os.path.splitext(os.path.basename(image_path))[0]
+        output_filename = file_base + self.processor.output_extension(image_path)
         output_path = os.path.join(self.whitespace_folder, output_filename)
 
         if self.skip_processed and os.path.exists(output_path):
             self.logger.log(f"Skipping already processed image: {output_filename}")
             return
 
-        image = cv2.imread(image_path)
+        import cv2  # OpenCV is only loaded when whitespace removal actually runs
+        if RawPreviewExtractor.is_raw(image_path):
+            import numpy as np
+            preview = self.processor.raw_extractor.read_preview_bytes(image_path)
+            image = cv2.imdecode(np.frombuffer(preview, np.uint8), cv2.IMREAD_COLOR) if preview else None
+        else:
+            image = cv2.imread(image_path)
         if image is None:
             self.logger.log(f"Error reading image: {image_path}", level="error")
             return
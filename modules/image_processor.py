@@ -2,48 +2,137 @@ import os
 from time import time
 from PIL import Image, ImageOps
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from modules.config_loader import PauseManager, TimeTracker
 from modules.logger_utils import LoggerManager, SummaryLogger
 from modules.image_padder import ImagePadder
+from modules.profiler import RunProfiler
+from modules.raw_preview import RawPreviewExtractor
+from modules.whitespace_processor import WhitespaceProcessor
+from modules.size_policy import SizePolicy
 
 
 
 class ImageProcessor:
-    def __init__(self, config, time_tracker=None, logger=None):
+    def __init__(self, config, time_tracker=None, logger=None, pause_manager=None, profiler=None):
         self.config = config
         self.time_tracker = time_tracker or TimeTracker()
         self.logger = logger or LoggerManager()
+        self.pause_manager = pause_manager or PauseManager(config, logger=self.logger)
+        self.profiler = profiler or RunProfiler(config, logger=self.logger)
+        self.raw_extractor = RawPreviewExtractor(config, logger=self.logger)
+        self.whitespace_util = WhitespaceProcessor(config, logger=self.logger)
+        self.size_policy = SizePolicy(config, logger=self.logger, raw_extractor=self.raw_extractor)
 
         self.color_string = self.config.get("padding_color", "white").lower()
-        self.custom_colors = {
-            k.lower(): tuple(v) for k, v in self.config.get("custom_named_colors", {}).items()
-        }
+        # Loaded here so every entry point (run, bench, compare) knows colors.txt
+        self.custom_colors = ImagePadder.named_colors(self.config)
         self.padding_color_rgb = ImagePadder.parse_color_string(self.color_string, self.custom_colors)
 
-    def resize_image(self, image_path, output_folder, sizes, pbar=None):
-        img = Image.open(image_path)
-        filename = os.path.basename(image_path)
-        file_base, ext = os.path.splitext(filename)
+    def default_profile(self, output_folder, sizes):
+        return {
+            "name": "default",
+            "sizes": sizes,
+            "padding_color": self.padding_color_rgb,
+            "output_folder": output_folder,
+            "remove_whitespace": False,
+            "extension": None,
+            "save_options": {},
+        }
+
+    def build_profiles(self, output_folder, sizes, root=None):
+        """
+        Output profiles from `output_profiles` in the config, or a single
+        profile from the top-level settings when none are declared.
+
+        With `root`, every profile writes to root/<name> (or root itself for
+        the default profile), ignoring any configured output_folder; bench
+        and compare use this to keep all outputs in their temp directory.
+        """
+        declared = self.config.get("output_profiles")
+        if not declared:
+            return [self.default_profile(root or output_folder, sizes)]
+
+        profiles = []
+        for i, entry in enumerate(declared):
+            name = entry.get("name", f"profile_{i + 1}")
+            extension = entry.get("output_format")
+            if extension:
+                extension = "." + str(extension).lower().lstrip(".")
+            remove_whitespace = str(entry.get("whitespace_option", "")).lower() == "remove"
+            if remove_whitespace and not self.whitespace_util.safety_process():
+                self.logger.log(f"Profile '{name}' asks for whitespace removal but "
+                                f"enable_whitespace_removal is off; writing it untrimmed.")
+                remove_whitespace = False
+            if root:
+                profile_folder = os.path.join(root, name)
+            else:
+                profile_folder = entry.get("output_folder", os.path.join(output_folder, name))
+            profiles.append({
+                "name": name,
+                "sizes": entry.get("resize_sizes", sizes),
+                "padding_color": ImagePadder.parse_color_string(
+                    str(entry.get("padding_color", self.color_string)), self.custom_colors
+                ),
+                "output_folder": os.path.abspath(profile_folder),
+                "remove_whitespace": remove_whitespace,
+                "extension": extension,
+                "save_options": entry.get("save_options") or {},
+            })
+        return profiles
+
+    def resize_image(self, image_path, output_folder, sizes, pbar=None, profiles=None):
+        """
+        Decode once and write every profile's outputs. Profiles that ask for the
+        same size (on the same whitespace-trimmed or untrimmed source) share
+        one LANCZOS resample; only padding and encoding are per profile.
+        """
+        profiles = profiles or [self.default_profile(output_folder, sizes)]
         start_time = time()
+        img = self.open_image(image_path, max(max(p["sizes"]) for p in profiles))
+        self.time_tracker.add_stage_time("decode", time() - start_time)
+        filename = os.path.basename(image_path)
+        file_base, _ = os.path.splitext(filename)
 
-        #padding_color = self.config.get("padding_color", "white")
-        #color_map = {"white": (255, 255, 255), "black": (0, 0, 0)}
-        #padding_color_rgb = color_map.get(padding_color.lower(), padding_color)
+        sources = {False: img}
+        resampled = {}
+        for profile in profiles:
+            trim = profile["remove_whitespace"]
+            if trim not in sources:
+                stage_start = time()
+                sources[trim] = self.whitespace_util.crop_to_content(img)
+                self.time_tracker.add_stage_time("whitespace", time() - stage_start)
+            ext = profile["extension"] or self.output_extension(image_path)
 
-        for size in sizes:
-            img_resized = ImageOps.contain(img, (size, size), method=Image.LANCZOS)
-            img_padded = ImageOps.pad(img_resized, (size, size), method=Image.LANCZOS, color=self.padding_color_rgb)           
+            renders, links = self.size_policy.plan(sources[trim].size, profile["sizes"])
+            written = {}
+            for size, canvas in renders:
+                size_start = stage_start = time()
+                if (trim, canvas) not in resampled:
+                    resampled[(trim, canvas)] = self._contain(sources[trim], canvas)
+                fitted = resampled[(trim, canvas)]
+                color = ImagePadder.color_for_mode(profile["padding_color"], fitted.mode)
+                img_padded = ImageOps.pad(fitted, (canvas, canvas), method=Image.LANCZOS, color=color)
+                self.time_tracker.add_stage_time("resample", time() - stage_start)
 
+                size_folder = os.path.join(profile["output_folder"], f"img_{size}")
+                os.makedirs(size_folder, exist_ok=True)
 
-            size_folder = os.path.join(output_folder, f"img_{size}")
-            os.makedirs(size_folder, exist_ok=True)
+                output_filename = f"{file_base}_{size}{ext}"
+                output_path = os.path.join(size_folder, output_filename)
+                stage_start = time()
+                self._save(img_padded, output_path, profile["save_options"], profile["padding_color"])
+                self.time_tracker.add_stage_time("encode", time() - stage_start)
+                self.time_tracker.add_size_time(size, time() - size_start)
+                written[size] = output_path
+                self.logger.log(f"Padded with color and saved: {output_path}")
 
-            output_filename = f"{file_base}_{size}{ext}"
-            output_path = os.path.join(size_folder, output_filename)
-            img_padded.save(output_path)
-            self.logger.log(f"Padded with color and saved: {output_path}")
+            for size, source_size in links.items():
+                output_path = os.path.join(profile["output_folder"], f"img_{size}", f"{file_base}_{size}{ext}")
+                self.size_policy.link(written[source_size], output_path)
+                self.logger.log(f"Linked native-resolution output: {output_path}")
 
+        self.profiler.memory_checkpoint()
         if pbar:
             pbar.update(1)
 
@@ -53,6 +142,80 @@ class ImageProcessor:
         self.logger.log(f"Time taken for {filename}: {processing_time:.2f} seconds")
         return image_path
 
+    def resize_batch(self, image_paths, output_folder, sizes, pbar=None, profiles=None):
+        """
+        Several (small) images in one worker task to cut per-task overhead.
+        Each image is profiled on its own, as if it were its own task.
+        """
+        for image_path in image_paths:
+            self.profiler.run(self.resize_image, image_path, output_folder, sizes, pbar, profiles)
+        return image_paths
+
+    def _tasks(self, image_files):
+        """
+        Yield lists of paths to submit: one per normal image, and batches of
+        up to small_source_batch images below small_source_threshold.
+        """
+        if self.size_policy.batch_size == 1:
+            for path in image_files:
+                yield [path]
+            return
+        batch = []
+        for path in image_files:
+            if not self.size_policy.is_small(path):
+                yield [path]
+                continue
+            batch.append(path)
+            if len(batch) == self.size_policy.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _contain(img, canvas):
+        """
+        Like ImageOps.contain, but never rounds a side down to zero, so
+        slivers such as 1500x3 still fit small canvases.
+        """
+        longest = max(img.size)
+        size = tuple(max(1, round(side / longest * canvas)) for side in img.size)
+        return img if size == img.size else img.resize(size, Image.LANCZOS)
+
+    @staticmethod
+    def _save(img, output_path, save_options, background=(255, 255, 255)):
+        # A profile may re-encode e.g. RGBA PNGs as JPEG, which has no alpha:
+        # flatten onto the padding colour so transparent areas match the border
+        if output_path.lower().endswith((".jpg", ".jpeg")) and img.mode not in ("RGB", "L", "CMYK"):
+            if img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info:
+                base = Image.new("RGBA", img.size, tuple(background[:3]) + (255,))
+                img = Image.alpha_composite(base, img.convert("RGBA"))
+            img = img.convert("RGB")
+        # Save beside the target and swap it in: the target may be a hardlink
+        # shared with other img_N folders (small_source_policy: native), and
+        # writing through it would change every linked copy
+        base, ext = os.path.splitext(output_path)
+        tmp_path = f"{base}.tmp{ext}"
+        try:
+            img.save(tmp_path, **save_options)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def open_image(self, image_path, max_size):
+        """Decoded image; RAW files come from their embedded preview when it is large enough."""
+        if RawPreviewExtractor.is_raw(image_path):
+            return self.raw_extractor.open(image_path, max_size)
+        img = Image.open(image_path)
+        img.load()
+        return img
+
+    def output_extension(self, image_path):
+        if RawPreviewExtractor.is_raw(image_path):
+            return self.config.get("raw_output_extension", ".jpg")
+        return os.path.splitext(image_path)[1]
+
     def find_images(self, input_folder, supported_formats=(".jpg", ".png", ".jpeg", ".tiff", ".nef")):
         image_files = []
         for root, dirs, files in os.walk(input_folder):
@@ -68,25 +231,55 @@ class ImageProcessor:
             return
 
         self.logger.log(f"Found {len(image_files)} images in the bin folder for processing.")
+        run_start = time()
         pbar = tqdm(total=len(image_files), desc="Processing images", unit="image")
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self.resize_image, path, output_folder, sizes, pbar) for path in image_files]
-            for future in as_completed(futures):
-                future.result()
+        # The pool is sized for the largest worker count we may be resized to;
+        # the dispatcher below keeps only worker_limit images in flight.
+        pool_size = self.pause_manager.start_stage(max_workers)
+        profiles = self.build_profiles(output_folder, sizes)
+        if len(profiles) > 1:
+            self.logger.log(f"Writing {len(profiles)} output profiles in one pass: "
+                            + ", ".join(p["name"] for p in profiles))
+        pending = self._tasks(image_files)
+        in_flight = set()
+
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            while True:
+                while len(in_flight) < self.pause_manager.worker_limit and self.pause_manager.pause_if_needed():
+                    task = next(pending, None)
+                    if task is None:
+                        break
+                    if len(task) == 1:
+                        future = executor.submit(self.profiler.run, self.resize_image, task[0], output_folder, sizes, pbar, profiles)
+                    else:
+                        future = executor.submit(self.resize_batch, task, output_folder, sizes, pbar, profiles)
+                    in_flight.add(future)
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
 
         pbar.close()
+        wall_time = time() - run_start
+        if self.pause_manager.draining:
+            self.logger.log(f"Drained: stopped after {self.time_tracker.total_images} of {len(image_files)} images.")
         self.logger.log("Image processing completed.")
 
         if self.time_tracker.total_images > 0:
             avg_time = self.time_tracker.average_time()
             self.logger.log(f"Total images processed: {self.time_tracker.total_images}")
-            self.logger.log(f"Total wall-clock time: {self.time_tracker.total_time:.2f} seconds")
+            self.logger.log(f"Total processing time: {self.time_tracker.total_time:.2f} seconds")
+            self.logger.log(f"Total wall-clock time: {wall_time:.2f} seconds")
             self.logger.log(f"Average time per image: {avg_time:.2f} seconds")
         else:
             self.logger.log("No images were processed.")
 
-        SummaryLogger().write_summary(self.time_tracker)
+        SummaryLogger(
+            db_path=self.config.get("metrics_db"),
+            prometheus_textfile=self.config.get("prometheus_textfile")
+        ).write_summary(self.time_tracker, wall_time=wall_time, workers=max_workers)
 
     def process_resizing_in_batches(self, bin_folder, output_folder, sizes, batch_size):
         image_files = self.find_images(bin_folder)
@@ -1,8 +1,6 @@
 import os
 import logging
-from datetime import datetime
-import re
-from modules.config_loader import ConfigLoader
+from modules.metrics_store import MetricsStore
 
 
 class LoggerManager:
@@ -21,6 +19,13 @@ class LoggerManager:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
 
+    def set_level(self, level):
+        """Change verbosity mid-run, e.g. 'debug', 'info' or 'error'."""
+        numeric = logging.getLevelName(level.upper())
+        if not isinstance(numeric, int):
+            raise ValueError(f"Unknown log level: {level}")
+        logging.getLogger().setLevel(numeric)
+
     def log(self, message, level="info"):
         if level == "info":
             logging.info(message)
@@ -29,67 +34,44 @@ class LoggerManager:
         elif level == "debug":
             logging.debug(message)
 
-        print(message)  # Also print to console
+        if logging.getLogger().isEnabledFor(logging.getLevelName(level.upper())):
+            print(message)  # Also print to console
 
 
 class SummaryLogger:
     """
-    Writes a summary log for a single run.
+    Records the summary of a single run in the metrics store.
     """
-    def __init__(self, log_dir='./logs'):
+    def __init__(self, log_dir='./logs', db_path=None, prometheus_textfile=None):
         
         self.log_dir = log_dir
         os.makedirs(log_dir, exist_ok=True)
+        self.store = MetricsStore(db_path or os.path.join(log_dir, 'metrics.sqlite3'))
+        self.prometheus_textfile = prometheus_textfile
+
+    def write_summary(self, time_tracker, wall_time=None, workers=None):
+        run_id = self.store.record_run(
+            total_images=time_tracker.total_images,
+            total_time=time_tracker.total_time,
+            wall_time=wall_time if wall_time is not None else time_tracker.total_time,
+            workers=workers,
+            stages=time_tracker.stage_summary()
+        )
+        print(f"Run {run_id} recorded in {self.store.db_path}")
 
-    def write_summary(self, time_tracker):
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'summary_{timestamp}.log'
-        path = os.path.join(self.log_dir, filename)
-
-        with open(path, 'w') as f:
-            if time_tracker.total_images > 0:
-                avg = time_tracker.average_time()
-                f.write(f"Total images processed: {time_tracker.total_images}\n")
-                f.write(f"Total time for all images: {time_tracker.total_time:.2f} seconds\n")
-                f.write(f"Average time per image: {avg:.2f} seconds\n")
-            else:
-                f.write("No images were processed.\n")
-
-        print(f"Summary written to {filename}")
+        if self.prometheus_textfile:
+            self.store.export_prometheus(self.prometheus_textfile)
 
 
 class DailyAggregator:
     """
-    Aggregates all summary logs by day and writes a daily summary file.
+    Reports daily (or weekly) totals from the incrementally maintained rollups.
     """
-    def __init__(self, summary_dir='./logs'):        
+    def __init__(self, summary_dir='./logs', db_path=None):        
         self.summary_dir = summary_dir
+        self.store = MetricsStore(db_path or os.path.join(summary_dir, 'metrics.sqlite3'))
 
-    def analyze(self):
-        files = [f for f in os.listdir(self.summary_dir) if f.startswith('summary_') and f.endswith('.log')]
-        data_by_day = {}
-
-        for file in files:
-            match = re.match(r'summary_(\d{8})_\d{6}\.log', file)
-            if match:
-                date = match.group(1)
-                if date not in data_by_day:
-                    data_by_day[date] = {'total_images': 0, 'total_time': 0.0}
-
-                with open(os.path.join(self.summary_dir, file), 'r') as f:
-                    for line in f:
-                        if line.startswith('Total images processed:'):
-                            data_by_day[date]['total_images'] += int(line.split(':')[1].strip())
-                        elif line.startswith('Total time for all images:'):
-                            data_by_day[date]['total_time'] += float(line.split(':')[1].strip().replace(' seconds', ''))
-
-        for date, data in data_by_day.items():
-            if data['total_images'] > 0:
-                avg = data['total_time'] / data['total_images']
-                file_name = f'daily_summary_{date}.log'
-                with open(os.path.join(self.summary_dir, file_name), 'w') as f:
-                    f.write(f"Summary for {date}:\n")
-                    f.write(f"Total images processed: {data['total_images']}\n")
-                    f.write(f"Total time for all images: {data['total_time']:.2f} seconds\n")
-                    f.write(f"Average time per image: {avg:.2f} seconds\n")
-                print(f"Daily summary written to {file_name}")
+    def analyze(self, period="daily", limit=14):
+        rows = self.store.trend(period, limit)
+        print(self.store.format_trend(rows))
+        return rows
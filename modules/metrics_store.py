@@ -0,0 +1,231 @@
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime
+
+
+class MetricsStore:
+    """
+    Append-only SQLite store for run and stage metrics.
+
+    Each run inserts one row into `runs` plus one row per stage into `stages`,
+    and bumps the daily/weekly/stage rollup rows in the same transaction, so
+    reports read a handful of pre-aggregated rows regardless of history size.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            finished_at TEXT NOT NULL,
+            day TEXT NOT NULL,
+            week TEXT NOT NULL,
+            total_images INTEGER NOT NULL,
+            total_time REAL NOT NULL,
+            wall_time REAL NOT NULL,
+            workers INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS stages (
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            stage TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day TEXT PRIMARY KEY,
+            runs INTEGER NOT NULL,
+            total_images INTEGER NOT NULL,
+            total_time REAL NOT NULL,
+            wall_time REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS weekly_rollup (
+            week TEXT PRIMARY KEY,
+            runs INTEGER NOT NULL,
+            total_images INTEGER NOT NULL,
+            total_time REAL NOT NULL,
+            wall_time REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stage_rollup (
+            stage TEXT PRIMARY KEY,
+            calls INTEGER NOT NULL,
+            seconds REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path='./logs/metrics.sqlite3'):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def record_run(self, total_images, total_time, wall_time, workers=None, stages=None, finished_at=None):
+        """
+        Append one run and update rollups incrementally.
+        `stages` maps a stage name to (calls, seconds); resample and encode
+        run once per output size, so calls is not an image count.
+        """
+        finished_at = finished_at or datetime.now()
+        day = finished_at.strftime('%Y-%m-%d')
+        iso_year, iso_week, _ = finished_at.isocalendar()
+        week = f"{iso_year}-W{iso_week:02d}"
+        stages = stages or {}
+
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO runs (finished_at, day, week, total_images, total_time, wall_time, workers) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (finished_at.isoformat(timespec='seconds'), day, week, total_images, total_time, wall_time, workers)
+            )
+            run_id = cur.lastrowid
+            for table, key_col, key in (("daily_rollup", "day", day), ("weekly_rollup", "week", week)):
+                conn.execute(
+                    f"INSERT INTO {table} ({key_col}, runs, total_images, total_time, wall_time) "
+                    f"VALUES (?, 1, ?, ?, ?) "
+                    f"ON CONFLICT({key_col}) DO UPDATE SET runs = runs + 1, "
+                    f"total_images = total_images + excluded.total_images, "
+                    f"total_time = total_time + excluded.total_time, "
+                    f"wall_time = wall_time + excluded.wall_time",
+                    (key, total_images, total_time, wall_time)
+                )
+            for stage, (calls, seconds) in stages.items():
+                conn.execute(
+                    "INSERT INTO stages (run_id, stage, calls, seconds) VALUES (?, ?, ?, ?)",
+                    (run_id, stage, calls, seconds)
+                )
+                conn.execute(
+                    "INSERT INTO stage_rollup (stage, calls, seconds) VALUES (?, ?, ?) "
+                    "ON CONFLICT(stage) DO UPDATE SET calls = calls + excluded.calls, "
+                    "seconds = seconds + excluded.seconds",
+                    (stage, calls, seconds)
+                )
+        return run_id
+
+    def trend(self, period="daily", limit=14):
+        """Most recent `limit` days or weeks, oldest first, with throughput."""
+        if period not in ("daily", "weekly"):
+            raise ValueError(f"Unknown period '{period}'. Use 'daily' or 'weekly'.")
+        key_col = "day" if period == "daily" else "week"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {key_col}, runs, total_images, total_time, wall_time FROM {period}_rollup "
+                f"ORDER BY {key_col} DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._trend_row(*row) for row in reversed(rows)]
+
+    @staticmethod
+    def _trend_row(period, runs, images, total_time, wall_time):
+        return {
+            "period": period,
+            "runs": runs,
+            "total_images": images,
+            "total_time": total_time,
+            "wall_time": wall_time,
+            "avg_time_per_image": total_time / images if images else 0.0,
+            "images_per_second": images / wall_time if wall_time else 0.0,
+        }
+
+    @staticmethod
+    def format_trend(rows):
+        """Trend rows as the table shown by the CLI and DailyAggregator."""
+        lines = [f"{'period':<10} {'runs':>6} {'images':>9} {'avg s/img':>10} {'img/s':>9}"]
+        for row in rows:
+            lines.append(f"{row['period']:<10} {row['runs']:>6} {row['total_images']:>9} "
+                         f"{row['avg_time_per_image']:>10.3f} {row['images_per_second']:>9.2f}")
+        return "\n".join(lines)
+
+    def last_run(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, finished_at, total_images, total_time, wall_time, workers FROM runs "
+                "ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "finished_at", "total_images", "total_time", "wall_time", "workers")
+        return dict(zip(keys, row))
+
+    def stage_totals(self):
+        with self._connect() as conn:
+            return {stage: (calls, seconds) for stage, calls, seconds in
+                    conn.execute("SELECT stage, calls, seconds FROM stage_rollup ORDER BY stage")}
+
+    def export_prometheus(self, path):
+        """Write node-exporter textfile metrics atomically (tmp file + rename)."""
+        with self._connect() as conn:
+            runs, images, total_time, wall_time = conn.execute(
+                "SELECT COALESCE(SUM(runs), 0), COALESCE(SUM(total_images), 0), "
+                "COALESCE(SUM(total_time), 0), COALESCE(SUM(wall_time), 0) FROM daily_rollup"
+            ).fetchone()
+        last = self.last_run()
+
+        lines = [
+            "# HELP square_images_runs_total Completed processing runs.",
+            "# TYPE square_images_runs_total counter",
+            f"square_images_runs_total {runs}",
+            "# HELP square_images_images_total Images processed across all runs.",
+            "# TYPE square_images_images_total counter",
+            f"square_images_images_total {images}",
+            "# HELP square_images_processing_seconds_total Summed per-image processing time.",
+            "# TYPE square_images_processing_seconds_total counter",
+            f"square_images_processing_seconds_total {total_time:.6f}",
+            "# HELP square_images_wall_seconds_total Summed wall-clock run time.",
+            "# TYPE square_images_wall_seconds_total counter",
+            f"square_images_wall_seconds_total {wall_time:.6f}",
+            "# HELP square_images_stage_seconds_total Time spent per pipeline stage.",
+            "# TYPE square_images_stage_seconds_total counter",
+        ]
+        for stage, (_, seconds) in self.stage_totals().items():
+            lines.append(f'square_images_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}')
+        if last:
+            throughput = last["total_images"] / last["wall_time"] if last["wall_time"] else 0.0
+            finished = datetime.fromisoformat(last["finished_at"]).timestamp()
+            lines += [
+                "# HELP square_images_last_run_images Images processed by the last run.",
+                "# TYPE square_images_last_run_images gauge",
+                f"square_images_last_run_images {last['total_images']}",
+                "# HELP square_images_last_run_wall_seconds Wall-clock duration of the last run.",
+                "# TYPE square_images_last_run_wall_seconds gauge",
+                f"square_images_last_run_wall_seconds {last['wall_time']:.6f}",
+                "# HELP square_images_last_run_images_per_second Throughput of the last run.",
+                "# TYPE square_images_last_run_images_per_second gauge",
+                f"square_images_last_run_images_per_second {throughput:.6f}",
+                "# HELP square_images_last_run_timestamp_seconds Unix time the last run finished.",
+                "# TYPE square_images_last_run_timestamp_seconds gauge",
+                f"square_images_last_run_timestamp_seconds {finished:.0f}",
+            ]
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the run metrics store.")
+    parser.add_argument("--db", default="./logs/metrics.sqlite3", help="Path to the metrics database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    trend = sub.add_parser("trend", help="Show daily or weekly throughput")
+    trend.add_argument("--weekly", action="store_true", help="Group by ISO week instead of day")
+    trend.add_argument("--limit", type=int, default=14, help="Number of periods to show")
+
+    prom = sub.add_parser("export-prom", help="Write Prometheus textfile metrics")
+    prom.add_argument("path", help="Output .prom file, e.g. in the node exporter textfile directory")
+
+    args = parser.parse_args(argv)
+    store = MetricsStore(args.db)
+
+    if args.command == "trend":
+        print(store.format_trend(store.trend("weekly" if args.weekly else "daily", args.limit)))
+    elif args.command == "export-prom":
+        print(f"Prometheus metrics written to {store.export_prometheus(args.path)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
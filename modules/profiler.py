@@ -0,0 +1,247 @@
+import os
+import io
+import sys
+import heapq
+import pstats
+import random
+import cProfile
+import threading
+import tracemalloc
+from time import time, sleep
+from datetime import datetime
+from collections import Counter
+from modules.logger_utils import LoggerManager
+
+
+class RunProfiler:
+    """
+    Optional per-worker profiling for a processing run.
+
+    profile: null | cprofile | sampling
+        cprofile  - deterministic cProfile of each sampled image, one profile
+                    per worker thread, merged with pstats at the end.
+        sampling  - a background thread snapshots worker stacks every
+                    profile_interval seconds; cheap enough to leave on.
+    profile_sample_rate  - fraction of images profiled (cprofile mode).
+    profile_slowest      - keep only the N slowest images instead of all.
+    profile_memory       - tracemalloc peak and the top allocation sites
+                           while the largest image was still in memory
+                           (see memory_checkpoint).
+
+    On Python 3.12+ only one cProfile can be active at a time; images that
+    start while another is being profiled simply run unprofiled.
+    """
+    def __init__(self, config, logger=None):
+        self.config = config
+        self.logger = logger or LoggerManager()
+        self.mode = str(config.get("profile") or "").lower() or None
+        if self.mode not in (None, "cprofile", "sampling"):
+            raise ValueError(f"Unknown profile mode '{self.mode}'. Use 'cprofile' or 'sampling'.")
+        self.sample_rate = float(config.get("profile_sample_rate", 1.0))
+        self.interval = float(config.get("profile_interval", 0.005))
+        self.slowest_n = config.get("profile_slowest")
+        self.memory = bool(config.get("profile_memory", False))
+        self.memory_frames = config.get("profile_memory_frames", 10)
+        self.report_dir = config.get("profile_dir", "./logs/profiles")
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_profiles = []       # cprofile: one Profile per worker thread
+        self._slowest = []               # min-heap of (elapsed, seq, path, profile-or-Counter)
+        self._seq = 0
+        self._stacks = Counter()         # sampling: collapsed stack -> samples
+        self._active = {}                # sampling: thread ident -> Counter for its current image
+        self._stop = threading.Event()
+        self._sampler = None
+        self._peak_bytes = 0
+        self._peak_snapshot = None
+
+    @property
+    def enabled(self):
+        return self.mode is not None or self.memory
+
+    def start(self):
+        if self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+
+    def run(self, func, image_path, *args, **kwargs):
+        """Call func(image_path, ...) under whichever profiler is configured."""
+        if not self.enabled:
+            return func(image_path, *args, **kwargs)
+
+        start = time()
+        if self.mode == "cprofile" and random.random() < self.sample_rate:
+            result, profile = self._run_cprofile(func, image_path, *args, **kwargs)
+            self._record(time() - start, image_path, profile)
+        elif self.mode == "sampling":
+            counter = Counter()
+            ident = threading.get_ident()
+            with self._lock:
+                self._active[ident] = counter
+            try:
+                result = func(image_path, *args, **kwargs)
+            finally:
+                with self._lock:
+                    del self._active[ident]
+            self._record(time() - start, image_path, counter)
+        else:
+            result = func(image_path, *args, **kwargs)
+
+        return result
+
+    def _run_cprofile(self, func, *args, **kwargs):
+        if self.slowest_n:
+            profile = cProfile.Profile()
+        else:
+            profile = getattr(self._local, "profile", None)
+            if profile is None:
+                profile = self._local.profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return func(*args, **kwargs), None  # another profiler is active (3.12+)
+        if not self.slowest_n and not getattr(self._local, "registered", False):
+            # Registered only once it has data, so the merge never sees an empty one
+            self._local.registered = True
+            with self._lock:
+                self._thread_profiles.append(profile)
+        try:
+            return func(*args, **kwargs), profile
+        finally:
+            profile.disable()
+
+    def _record(self, elapsed, image_path, data):
+        if data is None:
+            return
+        with self._lock:
+            if not self.slowest_n:
+                if isinstance(data, Counter):
+                    self._stacks.update(data)
+                return
+            self._seq += 1
+            entry = (elapsed, self._seq, image_path, data)
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _sample_loop(self):
+        while not self._stop.is_set():
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, counter in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[self._collapse(frame)] += 1
+            sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def memory_checkpoint(self):
+        """
+        Called by a worker while its image's buffers are still referenced.
+        The snapshot with the most traced memory is kept for the report.
+        Pillow's pixel buffers are allocated in C and are not traced, so the
+        sites are Python-level (numpy, bytes, PIL wrappers).
+        """
+        if not self.memory or not tracemalloc.is_tracing():
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        # Snapshot only when usage grows noticeably; snapshots are not cheap.
+        if current > self._peak_bytes * 1.1:
+            with self._lock:
+                if current > self._peak_bytes * 1.1:
+                    self._peak_bytes = current
+                    self._peak_snapshot = tracemalloc.take_snapshot()
+
+    def stop_and_report(self):
+        """Stop profiling, merge all workers' data into one report and return its path."""
+        if not self.enabled:
+            return None
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_path = os.path.join(self.report_dir, f"profile_{timestamp}.txt")
+        out = io.StringIO()
+
+        if self.slowest_n:
+            out.write(f"Slowest {len(self._slowest)} images:\n")
+            for elapsed, _, path, _ in sorted(self._slowest, reverse=True):
+                out.write(f"  {elapsed:8.3f}s  {path}\n")
+            out.write("\n")
+
+        if self.mode == "cprofile":
+            profiles = [p for _, _, _, p in self._slowest] if self.slowest_n else self._thread_profiles
+            stats = None
+            for profile in profiles:
+                try:
+                    if stats is None:
+                        stats = pstats.Stats(profile, stream=out)
+                    else:
+                        stats.add(profile)
+                except TypeError:
+                    continue  # no calls recorded
+            if stats is not None:
+                stats.sort_stats("cumulative").print_stats(40)
+            else:
+                out.write("No images were profiled.\n")
+        elif self.mode == "sampling":
+            stacks = Counter()
+            if self.slowest_n:
+                for _, _, _, counter in self._slowest:
+                    stacks.update(counter)
+            else:
+                stacks = self._stacks
+            self._write_sampling_report(stacks, out)
+            collapsed_path = os.path.join(self.report_dir, f"profile_{timestamp}.collapsed")
+            with open(collapsed_path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        if self.memory:
+            self._write_memory_report(out)
+            tracemalloc.stop()
+
+        with open(report_path, 'w') as f:
+            f.write(out.getvalue())
+        self.logger.log(f"Profile report written to {report_path}")
+        return report_path
+
+    def _write_sampling_report(self, stacks, out):
+        total = sum(stacks.values())
+        out.write(f"{total} samples every {self.interval * 1000:.1f} ms\n\n")
+        if not total:
+            return
+        self_counts, cumulative = Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                cumulative[frame] += count
+        for title, counts in (("Self time", self_counts), ("Cumulative time", cumulative)):
+            out.write(f"{title}:\n")
+            for frame, count in counts.most_common(25):
+                out.write(f"  {100 * count / total:6.2f}%  {frame}\n")
+            out.write("\n")
+
+    def _write_memory_report(self, out):
+        current, peak = tracemalloc.get_traced_memory()
+        out.write(f"\nMemory: current {current / 1024 ** 2:.1f} MB, peak {peak / 1024 ** 2:.1f} MB\n")
+        if self._peak_snapshot is None:
+            return
+        out.write(f"Top allocation sites at the largest per-image checkpoint ({self._peak_bytes / 1024 ** 2:.1f} MB traced):\n")
+        for stat in self._peak_snapshot.statistics("lineno")[:20]:
+            out.write(f"  {stat}\n")
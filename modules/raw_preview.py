@@ -0,0 +1,211 @@
+import io
+import os
+import struct
+from modules.logger_utils import LoggerManager
+
+
+class RawPreviewExtractor:
+    """
+    Fast ingest for RAW (.nef) files.
+
+    NEFs are TIFF containers whose IFDs (IFD0 and its SubIFDs) carry one or
+    more embedded JPEG previews, the largest usually full size. We parse the
+    IFDs with struct, pick the largest baseline JPEG and hand it to PIL with
+    draft() so the JPEG decoder can scale down by 1/2, 1/4 or 1/8 on the fly.
+    A full raw decode (optional `rawpy`) is used only when that preview is
+    smaller than the largest requested size.
+    """
+    RAW_EXTENSIONS = (".nef",)
+
+    # TIFF tags
+    COMPRESSION = 0x0103
+    STRIP_OFFSETS = 0x0111
+    ORIENTATION = 0x0112
+    STRIP_BYTE_COUNTS = 0x0117
+    SUB_IFDS = 0x014A
+    JPEG_OFFSET = 0x0201
+    JPEG_LENGTH = 0x0202
+
+    TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+    BASELINE_SOF = (0xC0, 0xC1, 0xC2)  # what PIL can decode; lossless SOF3 is raw data
+
+    # EXIF orientation -> PIL transpose method, as in ImageOps.exif_transpose
+    ORIENTATION_TRANSPOSE = {2: "FLIP_LEFT_RIGHT", 3: "ROTATE_180", 4: "FLIP_TOP_BOTTOM",
+                             5: "TRANSPOSE", 6: "ROTATE_270", 7: "TRANSVERSE", 8: "ROTATE_90"}
+
+    def __init__(self, config, logger=None):
+        self.config = config
+        self.logger = logger or LoggerManager()
+        self.use_raw_decoder = config.get("raw_full_decode_fallback", True)
+
+    @classmethod
+    def is_raw(cls, path):
+        return path.lower().endswith(cls.RAW_EXTENSIONS)
+
+    def open(self, path, min_size):
+        """
+        Return a PIL image for a RAW file whose longest side is at least
+        min_size when the camera provided a preview that large.
+        """
+        preview = self.largest_preview(path)
+        if preview and max(preview["size"]) >= min_size:
+            return self._open_preview(preview, min_size)
+
+        if self.use_raw_decoder:
+            img = self._full_decode(path)
+            if img is not None:
+                return img
+
+        if preview:
+            self.logger.log(f"Using {preview['size'][0]}x{preview['size'][1]} preview for {path}; "
+                            f"install rawpy for a full decode.")
+            return self._open_preview(preview, min_size)
+        raise ValueError(f"No decodable preview found in RAW file: {path}")
+
+    def read_preview_bytes(self, path):
+        """Largest embedded JPEG as bytes (e.g. for cv2.imdecode), or None."""
+        preview = self.largest_preview(path)
+        return preview["data"] if preview else None
+
+    def preview_dimensions(self, path):
+        """(width, height) of the largest preview, read from headers only."""
+        with open(path, 'rb') as f:
+            try:
+                candidates = self._find_jpegs(f)
+            except (struct.error, ValueError):
+                return None
+        return max((c[2] for c in candidates), key=lambda size: size[0] * size[1], default=None)
+
+    def largest_preview(self, path):
+        with open(path, 'rb') as f:
+            try:
+                candidates = self._find_jpegs(f)
+            except (struct.error, ValueError):
+                return None
+            if not candidates:
+                return None
+            offset, length, size, orientation = max(candidates, key=lambda c: c[2][0] * c[2][1])
+            f.seek(offset)
+            return {"data": f.read(length), "size": size, "orientation": orientation}
+
+    def _open_preview(self, preview, min_size):
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(preview["data"]))
+        # Let libjpeg do the first downscale while decoding; never below min_size
+        width, height = preview["size"]
+        scale = min_size / max(width, height)
+        img.draft("RGB", (max(1, int(width * scale + 0.5)), max(1, int(height * scale + 0.5))))
+        img.load()
+
+        method = self.ORIENTATION_TRANSPOSE.get(preview["orientation"])
+        if method:
+            img = img.transpose(getattr(Image.Transpose, method))
+        return img
+
+    def _full_decode(self, path):
+        try:
+            import rawpy
+        except ImportError:
+            return None
+        from PIL import Image
+
+        with rawpy.imread(path) as raw:
+            rgb = raw.postprocess(use_camera_wb=True)
+        return Image.fromarray(rgb)
+
+    # --- TIFF container parsing -------------------------------------------
+
+    def _find_jpegs(self, f):
+        header = f.read(8)
+        if header[:2] == b'II':
+            endian = '<'
+        elif header[:2] == b'MM':
+            endian = '>'
+        else:
+            raise ValueError("Not a TIFF-based RAW file")
+        magic, ifd_offset = struct.unpack(endian + 'HI', header[2:8])
+        if magic != 42:
+            raise ValueError("Not a TIFF-based RAW file")
+
+        file_size = os.fstat(f.fileno()).st_size
+        candidates, visited = [], set()
+        orientation = 1
+        pending = [ifd_offset]
+        first = True
+        while pending:
+            offset = pending.pop()
+            if not offset or offset in visited or offset >= file_size or len(visited) > 64:
+                continue
+            visited.add(offset)
+            tags, next_ifd = self._read_ifd(f, endian, offset)
+            if first:
+                orientation = tags.get(self.ORIENTATION, [1])[0]
+                first = False
+            pending.append(next_ifd)
+            pending.extend(tags.get(self.SUB_IFDS, []))
+
+            if self.JPEG_OFFSET in tags and self.JPEG_LENGTH in tags:
+                jpeg = (tags[self.JPEG_OFFSET][0], tags[self.JPEG_LENGTH][0])
+            elif tags.get(self.COMPRESSION, [0])[0] in (6, 7) and len(tags.get(self.STRIP_OFFSETS, [])) == 1:
+                jpeg = (tags[self.STRIP_OFFSETS][0], tags[self.STRIP_BYTE_COUNTS][0])
+            else:
+                continue
+            if jpeg[0] + jpeg[1] > file_size:
+                continue
+            size = self._jpeg_size(f, jpeg[0])
+            if size:
+                candidates.append((jpeg[0], jpeg[1], size, orientation))
+        return candidates
+
+    def _read_ifd(self, f, endian, offset):
+        file_size = os.fstat(f.fileno()).st_size
+        f.seek(offset)
+        (count,) = struct.unpack(endian + 'H', f.read(2))
+        raw_entries = f.read(12 * count)
+        (next_ifd,) = struct.unpack(endian + 'I', f.read(4))
+
+        wanted = (self.COMPRESSION, self.STRIP_OFFSETS, self.ORIENTATION,
+                  self.STRIP_BYTE_COUNTS, self.SUB_IFDS, self.JPEG_OFFSET, self.JPEG_LENGTH)
+        tags = {}
+        for i in range(count):
+            tag, typ, n = struct.unpack(endian + 'HHI', raw_entries[i * 12:i * 12 + 8])
+            if tag not in wanted or typ not in (3, 4, 13):
+                continue
+            fmt = 'H' if typ == 3 else 'I'
+            size = self.TYPE_SIZES[typ] * n
+            value = raw_entries[i * 12 + 8:i * 12 + 12]
+            if size > 4:
+                (value_offset,) = struct.unpack(endian + 'I', value)
+                if value_offset + size > file_size:
+                    continue  # corrupt count or offset; never read past the file
+                here = f.tell()
+                f.seek(value_offset)
+                value = f.read(size)
+                f.seek(here)
+            tags[tag] = list(struct.unpack(endian + fmt * n, value[:size]))
+        return tags, next_ifd
+
+    def _jpeg_size(self, f, offset):
+        """(width, height) from the SOF marker of a baseline/progressive JPEG."""
+        f.seek(offset)
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] == 0xFF:
+                f.seek(-1, 1)  # fill byte before the real marker
+                continue
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue  # standalone markers carry no length
+            (length,) = struct.unpack('>H', f.read(2))
+            if marker[1] in self.BASELINE_SOF:
+                _, height, width = struct.unpack('>BHH', f.read(5))
+                return (width, height)
+            if 0xC3 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                return None  # lossless/arithmetic JPEG: compressed raw data, not a preview
+            if marker[1] == 0xDA:
+                return None
+            f.seek(length - 2, 1)
@@ -0,0 +1,88 @@
+import os
+import shutil
+from modules.logger_utils import LoggerManager
+from modules.raw_preview import RawPreviewExtractor
+
+
+class SizePolicy:
+    """
+    Decides per image which output sizes are worth rendering.
+
+    small_source_policy:
+        upscale - render every size (LANCZOS upscales small sources)
+        skip    - drop sizes larger than the source; if that would leave
+                  nothing, the smallest size is rendered at native resolution
+        native  - pad once at native resolution into the first larger size
+                  folder and link (or copy) that file into the other ones
+    Sources whose longest side is below small_source_threshold are grouped
+    into batches of small_source_batch images per worker task.
+    """
+    POLICIES = ("upscale", "skip", "native")
+    LINK_MODES = ("hardlink", "symlink", "copy")
+
+    def __init__(self, config, logger=None, raw_extractor=None):
+        self.config = config
+        self.logger = logger or LoggerManager()
+        self.raw_extractor = raw_extractor or RawPreviewExtractor(config, logger=self.logger)
+        self.policy = str(config.get("small_source_policy", "upscale")).lower()
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown small_source_policy '{self.policy}'. Use one of {self.POLICIES}.")
+        self.link_mode = str(config.get("small_source_link", "hardlink")).lower()
+        if self.link_mode not in self.LINK_MODES:
+            raise ValueError(f"Unknown small_source_link '{self.link_mode}'. Use one of {self.LINK_MODES}.")
+        self.threshold = config.get("small_source_threshold", 512)
+        self.batch_size = max(1, int(config.get("small_source_batch", 16)))
+
+    def source_size(self, image_path):
+        """(width, height) from the file header without decoding pixels, or None."""
+        try:
+            if RawPreviewExtractor.is_raw(image_path):
+                return self.raw_extractor.preview_dimensions(image_path)
+            from PIL import Image
+            with Image.open(image_path) as img:
+                return img.size
+        except (OSError, ValueError):
+            return None
+
+    def is_small(self, image_path):
+        size = self.source_size(image_path)
+        return size is not None and max(size) < self.threshold
+
+    def plan(self, source_size, sizes):
+        """
+        Returns (renders, links): renders is a list of (folder_size, canvas_size)
+        to resample and save; links maps folder_size -> folder_size whose file
+        it should reuse.
+        """
+        native = max(source_size)
+        if self.policy == "upscale":
+            return [(size, size) for size in sizes], {}
+
+        renders = [(size, size) for size in sizes if size <= native]
+        larger = sorted(size for size in sizes if size > native)
+        if not larger or (self.policy == "skip" and renders):
+            return renders, {}
+
+        # Native-resolution output for the first larger folder (for skip, only
+        # when nothing else would be written)
+        renders.append((larger[0], native))
+        links = {size: larger[0] for size in larger[1:]} if self.policy == "native" else {}
+        return renders, links
+
+    def link(self, source_path, target_path):
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if os.path.lexists(target_path):
+            os.remove(target_path)
+        if self.link_mode == "hardlink":
+            try:
+                os.link(source_path, target_path)
+                return
+            except OSError:
+                pass  # different filesystem or no hardlink support
+        elif self.link_mode == "symlink":
+            try:
+                os.symlink(os.path.relpath(source_path, os.path.dirname(target_path)), target_path)
+                return
+            except OSError:
+                pass  # e.g. Windows without symlink privilege
+        shutil.copy2(source_path, target_path)
@@ -1,8 +1,5 @@
 import os
-import cv2
-import numpy as np
 import shutil
-from PIL import Image, ImageChops
 from modules.logger_utils import LoggerManager
 
 
@@ -35,13 +32,30 @@ class WhitespaceProcessor:
 
         return True
 
+    def crop_to_content(self, img):
+        """
+        Crop a PIL image to the bounding box of pixels darker than
+        gray_threshold (and not fully transparent). Flat images are returned
+        unchanged.
+        """
+        from PIL import ImageChops
+
+        threshold = self.gray_threshold
+        mask = img.convert("L").point(lambda v: 255 if v < threshold else 0)
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            alpha = img.convert("RGBA").getchannel("A").point(lambda a: 255 if a else 0)
+            mask = ImageChops.multiply(mask, alpha)
+        bbox = mask.getbbox()
+        return img.crop(bbox) if bbox else img
+
     def remove_whitespace_and_resize(self, image, image_path, size):
         ''' Experimental process
         '''  
        
         if not self.safety_process():
             return None
-            
+
+        import cv2  # OpenCV is only loaded when whitespace removal actually runs
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         _, binary_mask = cv2.threshold(gray, self.gray_threshold, 255, cv2.THRESH_BINARY_INV)
         contours, _ = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -59,6 +73,7 @@ class WhitespaceProcessor:
 
     def remove_whitespace_process(self, image_path, output_folder, archive_folder, skip_processed=False, copy_to_archive=True):
        
+        import cv2
         output_filename = os.path.basename(image_path)
         image = cv2.imread(image_path)
         
@@ -32,7 +32,11 @@ class SystemEstimator:
         return total_images, total_size
 
     def calculate_overhead(self):
-        cpu = psutil.cpu_percent(interval=1)
+        if hasattr(os, "getloadavg"):
+            # Instant on POSIX; cpu_percent would block for a full sampling interval
+            cpu = min(100.0, os.getloadavg()[0] / (os.cpu_count() or 1) * 100)
+        else:
+            cpu = psutil.cpu_percent(interval=1)
         mem = psutil.virtual_memory().percent
         disk_io = psutil.disk_io_counters().read_time + psutil.disk_io_counters().write_time
 